@@ -3,20 +3,215 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 from sklearn.preprocessing import MinMaxScaler, LabelEncoder
+from numba import njit, types
 import re
+import pickle
 from io import BytesIO
 
+# Copy-on-write lets cleaning steps share column data until it's actually modified
+pd.set_option('mode.copy_on_write', True)
+
 # Initialize session state
 if 'df' not in st.session_state:
     st.session_state.df = None
 if 'logs' not in st.session_state:
     st.session_state.logs = []
 
+EMAIL_RE = re.compile(r'^[\w.-]+@[\w.-]+\.\w+$')
+
+ASTYPE_TARGETS = {"Category": "category", "String": "string"}
+
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "JSON": ("json", "application/json"),
+}
+
 # Utility functions
 def log_action(action):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     st.session_state.logs.append(f"{timestamp} - {action}")
 
+def _categorize_text(df, max_ratio=0.5):
+    # Low-cardinality text (e.g. Sex, Embarked) is stored once per unique value; runs
+    # inside the loaders so it happens once per upload/sample
+    if df.empty:
+        return df
+    df = df.copy(deep=False)
+    for col in df.select_dtypes(include='object').columns:
+        try:
+            if df[col].nunique(dropna=False) / len(df) < max_ratio:
+                df[col] = df[col].astype('category')
+        except TypeError:
+            # Unhashable values (lists, dicts) can't be categories; leave as object
+            continue
+    return df
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_dataframe(file_bytes, ext):
+    if ext == 'csv':
+        try:
+            # Multithreaded Arrow parser; falls back to the C parser if pyarrow
+            # is unavailable or rejects the file
+            df = pd.read_csv(BytesIO(file_bytes), engine='pyarrow')
+        except (ImportError, ValueError):
+            df = pd.read_csv(BytesIO(file_bytes))
+    elif ext == 'xlsx':
+        df = pd.read_excel(BytesIO(file_bytes), engine='calamine')
+    elif ext == 'json':
+        df = pd.read_json(BytesIO(file_bytes))
+    else:
+        raise ValueError(f"Unsupported file type: {ext}")
+    return _categorize_text(df)
+
+@st.cache_data(ttl=3600)
+def load_sample(name):
+    if name == "Titanic":
+        df = pd.read_csv("https://web.stanford.edu/class/archive/cs/cs109/cs109.1166/stuff/titanic.csv")
+    elif name == "Iris":
+        df = pd.read_csv("https://archive.ics.uci.edu/ml/machine-learning-databases/iris/iris.data",
+                         names=["sepal_length", "sepal_width", "petal_length", "petal_width", "class"])
+    elif name == "Tips":
+        df = pd.read_csv("https://raw.githubusercontent.com/mwaskom/seaborn-data/master/tips.csv")
+    return _categorize_text(df)
+
+# Cached cleaning steps - hashing the frame is much cheaper than re-running pandas ops
+def _hash_df(d):
+    # Row hashes cover only values and index, so labels and dtypes (an object column
+    # and its categorical hash the same) are part of the key
+    if isinstance(d, pd.DataFrame):
+        labels, dtypes = tuple(d.columns), tuple(d.dtypes.astype(str))
+    else:
+        labels, dtypes = d.name, str(d.dtype)
+    try:
+        row_hashes = pd.util.hash_pandas_object(d, index=True).values.tobytes()
+    except TypeError:
+        # Unhashable cells (e.g. nested lists from JSON) - fall back to the full pickle
+        return pickle.dumps(d)
+    return (row_hashes, d.shape, labels, dtypes)
+
+DF_HASH_FUNCS = {pd.DataFrame: _hash_df, pd.Series: _hash_df}
+
+def _map_text(s, func):
+    # For categoricals only the unique categories are transformed, not every row
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.map(lambda v: func(v) if isinstance(v, str) else v, na_action='ignore')
+    return pd.Series([func(v) if isinstance(v, str) else v for v in s], index=s.index, dtype=s.dtype)
+
+def _strip_title(v):
+    return v.strip().title()
+
+@st.cache_data(hash_funcs=DF_HASH_FUNCS, max_entries=8)
+def remove_dupes(df):
+    return df.drop_duplicates()
+
+@st.cache_data(hash_funcs=DF_HASH_FUNCS, max_entries=8)
+def fill_missing(df, treatments):
+    # Treatments run in order since dropping rows changes later fill statistics
+    df = df.copy(deep=False)
+    for col, method in treatments.items():
+        if method == "Drop rows":
+            df = df.dropna(subset=[col])
+            continue
+        if method == "Fill with mean":
+            fill_value = df[col].mean()
+        elif method == "Fill with median":
+            fill_value = df[col].median()
+        else:
+            fill_value = df[col].mode()[0]
+        df[col] = df[col].fillna(fill_value)
+    return df
+
+@st.cache_data(hash_funcs=DF_HASH_FUNCS, max_entries=8)
+def convert_types(df, conversions):
+    # Parsing conversions can fail per column, so only those are applied one by one;
+    # plain dtype casts go through a single astype call
+    df = df.copy(deep=False)
+    errors = {}
+    for col, new_type in conversions.items():
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # to_datetime keeps categoricals categorical, so parse the plain values
+            values = values.astype(object)
+        try:
+            if new_type == "Numeric":
+                df[col] = pd.to_numeric(values)
+            elif new_type == "Datetime":
+                df[col] = pd.to_datetime(values)
+        except Exception as e:
+            errors[col] = str(e)
+    
+    casts = {col: ASTYPE_TARGETS[new_type] for col, new_type in conversions.items()
+             if new_type in ASTYPE_TARGETS}
+    if casts:
+        try:
+            df = df.astype(casts)
+        except Exception:
+            # Retry one column at a time so the failing ones can be reported
+            for col, dtype in casts.items():
+                try:
+                    df[col] = df[col].astype(dtype)
+                except Exception as e:
+                    errors[col] = str(e)
+    return df, errors
+
+@st.cache_data(hash_funcs=DF_HASH_FUNCS, max_entries=8)
+def clean_text(df, trim_cols, case_cols):
+    # Columns selected for both operations are stripped and title-cased in one pass,
+    # and all cleaned columns are written back with a single assignment
+    cleaned = {}
+    for col in dict.fromkeys(trim_cols + case_cols):
+        if col in trim_cols and col in case_cols:
+            func = _strip_title
+        elif col in trim_cols:
+            func = str.strip
+        else:
+            func = str.title
+        cleaned[col] = _map_text(df[col], func)
+    df = df.copy(deep=False)
+    df[list(cleaned)] = pd.DataFrame(cleaned, index=df.index)
+    return df
+
+# Cached summaries - each step only pays for the scan it displays
+@st.cache_data(hash_funcs=DF_HASH_FUNCS, max_entries=8)
+def count_duplicates(df):
+    return int(df.duplicated().sum())
+
+@st.cache_data(hash_funcs=DF_HASH_FUNCS, max_entries=8)
+def missing_summary(df):
+    return df.isna().sum()
+
+# Cached validators
+@st.cache_data(hash_funcs=DF_HASH_FUNCS, max_entries=8)
+def validate_email(series):
+    return int((~series.str.match(EMAIL_RE, na=False)).sum())
+
+# Eagerly compiled for float64 so the first validation doesn't pay JIT cost. A read-only
+# 'A' array also matches writable, strided and copy-on-write to_numpy() views
+@njit([types.boolean[:](types.Array(types.float64, 1, 'A', readonly=True), types.float64, types.float64)],
+      cache=True)
+def range_mask(a, lo, hi):
+    out = np.empty(a.shape[0], np.bool_)
+    for i in range(a.shape[0]):
+        # Written as a negated between() so NaN counts as out of range
+        out[i] = not (a[i] >= lo and a[i] <= hi)
+    return out
+
+# Export helpers - to_excel_bytes is only called through the cached export_bytes
+def to_excel_bytes(df):
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        df.to_excel(writer, index=False)
+    return output.getvalue()
+
+@st.cache_data(hash_funcs=DF_HASH_FUNCS, max_entries=8)
+def export_bytes(df, export_format):
+    if export_format == "CSV":
+        return df.to_csv(index=False).encode()
+    elif export_format == "Excel":
+        return to_excel_bytes(df)
+    return df.to_json(orient='records').encode()
+
 # Main app
 st.title("📊 Data Sweeper")
 st.subheader("Clean, Transform & Optimize Your Datasets")
@@ -41,28 +236,18 @@ if upload_option == "Upload File":
     
     if uploaded_file:
         try:
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            elif uploaded_file.name.endswith('.xlsx'):
-                df = pd.read_excel(uploaded_file)
-            elif uploaded_file.name.endswith('.json'):
-                df = pd.read_json(uploaded_file)
+            file_extension = uploaded_file.name.rsplit('.', 1)[-1].lower()
+            df = load_dataframe(uploaded_file.getvalue(), file_extension)
             
-            st.session_state.df = df.copy()
+            st.session_state.df = df
             log_action(f"Uploaded file: {uploaded_file.name}")
             
         except Exception as e:
             st.error(f"Error loading file: {str(e)}")
 else:
-    if sample_dataset == "Titanic":
-        df = pd.read_csv("https://web.stanford.edu/class/archive/cs/cs109/cs109.1166/stuff/titanic.csv")
-    elif sample_dataset == "Iris":
-        df = pd.read_csv("https://archive.ics.uci.edu/ml/machine-learning-databases/iris/iris.data",
-                         names=["sepal_length", "sepal_width", "petal_length", "petal_width", "class"])
-    elif sample_dataset == "Tips":
-        df = pd.read_csv("https://raw.githubusercontent.com/mwaskom/seaborn-data/master/tips.csv")
+    df = load_sample(sample_dataset)
     
-    st.session_state.df = df.copy()
+    st.session_state.df = df
     log_action(f"Loaded sample dataset: {sample_dataset}")
 
 # Show raw data preview
@@ -73,6 +258,8 @@ if st.session_state.df is not None:
 
     # Data Cleaning Section
     st.header("Step 2: Data Cleaning")
+    # Work on a local frame and publish it to session state once, after all steps
+    df = st.session_state.df
     
     cleaning_options = st.multiselect("Select Cleaning Operations",
                                      ["Remove Duplicates", 
@@ -82,49 +269,43 @@ if st.session_state.df is not None:
     
     # Duplicate Removal
     if "Remove Duplicates" in cleaning_options:
-        duplicates = st.session_state.df.duplicated().sum()
+        duplicates = count_duplicates(df)
         if duplicates > 0:
             if st.checkbox(f"Remove {duplicates} duplicates?"):
-                st.session_state.df = st.session_state.df.drop_duplicates()
+                df = remove_dupes(df)
                 log_action(f"Removed {duplicates} duplicate rows")
     
     # Missing Values Handling
     if "Handle Missing Values" in cleaning_options:
         st.subheader("Missing Values Treatment")
-        missing = st.session_state.df.isna().sum()
+        missing = missing_summary(df)
+        missing = missing[missing > 0]
         st.write("Missing values per column:")
-        st.write(missing[missing > 0])
+        st.write(missing)
         
-        for col in missing[missing > 0].index:
-            treatment = st.selectbox(
+        treatments = {}
+        for col in missing.index:
+            treatments[col] = st.selectbox(
                 f"Treatment for {col}",
                 ["Drop rows", "Fill with mean", "Fill with median", "Fill with mode"],
                 key=f"missing_{col}"
             )
-            
-            if treatment == "Drop rows":
-                st.session_state.df = st.session_state.df.dropna(subset=[col])
-                log_action(f"Dropped rows with missing {col}")
-            else:
-                if treatment == "Fill with mean":
-                    fill_value = st.session_state.df[col].mean()
-                elif treatment == "Fill with median":
-                    fill_value = st.session_state.df[col].median()
+        
+        if treatments:
+            df = fill_missing(df, treatments)
+            for col, treatment in treatments.items():
+                if treatment == "Drop rows":
+                    log_action(f"Dropped rows with missing {col}")
                 else:
-                    fill_value = st.session_state.df[col].mode()[0]
-                
-                st.session_state.df[col] = st.session_state.df[col].fillna(fill_value)
-                log_action(f"Filled missing {col} with {fill_value}")
+                    log_action(f"Filled missing {col} ({treatment.lower()})")
     
     # Data Type Standardization
     if "Standardize Data Types" in cleaning_options:
         st.subheader("Data Type Conversion")
-        numeric_cols = st.session_state.df.select_dtypes(include=np.number).columns.tolist()
-        date_cols = st.session_state.df.select_dtypes(include='datetime').columns.tolist()
-        text_cols = st.session_state.df.select_dtypes(include='object').columns.tolist()
         
-        for col in st.session_state.df.columns:
-            current_type = st.session_state.df[col].dtype
+        conversions = {}
+        for col in df.columns:
+            current_type = df[col].dtype
             new_type = st.selectbox(
                 f"{col} ({current_type})",
                 ["Keep as is", "Numeric", "Datetime", "Category", "String"],
@@ -132,73 +313,88 @@ if st.session_state.df is not None:
             )
             
             if new_type != "Keep as is":
-                try:
-                    if new_type == "Numeric":
-                        st.session_state.df[col] = pd.to_numeric(st.session_state.df[col])
-                    elif new_type == "Datetime":
-                        st.session_state.df[col] = pd.to_datetime(st.session_state.df[col])
-                    elif new_type == "Category":
-                        st.session_state.df[col] = st.session_state.df[col].astype('category')
-                    elif new_type == "String":
-                        st.session_state.df[col] = st.session_state.df[col].astype('string')
-                    
-                    log_action(f"Converted {col} from {current_type} to {new_type}")
-                except Exception as e:
-                    st.error(f"Error converting {col}: {str(e)}")
+                conversions[col] = new_type
+        
+        if conversions:
+            original_types = df.dtypes
+            df, errors = convert_types(df, conversions)
+            for col, new_type in conversions.items():
+                if col in errors:
+                    st.error(f"Error converting {col}: {errors[col]}")
+                else:
+                    log_action(f"Converted {col} from {original_types[col]} to {new_type}")
     
     # Text Cleaning
     if "Clean Text Data" in cleaning_options:
         st.subheader("Text Data Cleaning")
-        text_cols = st.session_state.df.select_dtypes(include='object').columns.tolist()
+        text_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
+        if not text_cols:
+            st.info("No text columns to clean")
         
+        trim_cols, case_cols = [], []
         for col in text_cols:
             st.write(f"Cleaning {col}")
             if st.checkbox(f"Trim whitespace in {col}", key=f"trim_{col}"):
-                st.session_state.df[col] = st.session_state.df[col].str.strip()
-                log_action(f"Trimmed whitespace in {col}")
-            
+                trim_cols.append(col)
             if st.checkbox(f"Standardize case in {col}", key=f"case_{col}"):
-                st.session_state.df[col] = st.session_state.df[col].str.title()
+                case_cols.append(col)
+        
+        if trim_cols or case_cols:
+            df = clean_text(df, trim_cols, case_cols)
+            for col in trim_cols:
+                log_action(f"Trimmed whitespace in {col}")
+            for col in case_cols:
                 log_action(f"Standardized case in {col}")
+    
+    st.session_state.df = df
 
 # Data Validation Section
 st.header("Step 3: Data Validation")
-if st.session_state.df is not None:
-    validation_col = st.selectbox("Select column to validate", st.session_state.df.columns)
+
+# Validation widgets only rerun this fragment, not ingestion and cleaning
+@st.fragment
+def validation_section():
+    df = st.session_state.df
+    validation_col = st.selectbox("Select column to validate", df.columns)
     
-    if st.session_state.df[validation_col].dtype == 'object':
+    validation_dtype = df[validation_col].dtype
+    is_text_category = (isinstance(validation_dtype, pd.CategoricalDtype)
+                        and pd.api.types.is_string_dtype(validation_dtype.categories))
+    if validation_dtype == 'object' or is_text_category:
         if st.checkbox("Validate Email Format"):
-            email_pattern = r'^[\w\.-]+@[\w\.-]+\.\w+$'
-            invalid_emails = ~st.session_state.df[validation_col].str.match(email_pattern, na=False)
-            st.write(f"Found {invalid_emails.sum()} invalid email addresses")
+            invalid_emails = validate_email(df[validation_col])
+            st.write(f"Found {invalid_emails} invalid email addresses")
     
-    if np.issubdtype(st.session_state.df[validation_col].dtype, np.number):
+    if pd.api.types.is_numeric_dtype(validation_dtype) and not pd.api.types.is_bool_dtype(validation_dtype):
         min_val = st.number_input("Minimum allowed value", value=0)
         max_val = st.number_input("Maximum allowed value", value=100)
-        invalid_values = ~st.session_state.df[validation_col].between(min_val, max_val)
+        values = df[validation_col].to_numpy(dtype=np.float64, na_value=np.nan)
+        invalid_values = range_mask(values, float(min_val), float(max_val))
         st.write(f"Found {invalid_values.sum()} values outside range {min_val}-{max_val}")
 
+if st.session_state.df is not None:
+    validation_section()
+
 # Data Export Section
 st.header("Step 4: Export Cleaned Data")
-if st.session_state.df is not None:
-    export_format = st.selectbox("Export Format", ["CSV", "Excel", "JSON"])
-    
-    if export_format == "CSV":
-        output = st.session_state.df.to_csv(index=False).encode()
-    elif export_format == "Excel":
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            st.session_state.df.to_excel(writer, index=False)
-        output = output.getvalue()
-    else:
-        output = st.session_state.df.to_json(indent=2).encode()
+
+# Runs as a fragment so choosing a format doesn't rerun the cleaning steps, and the
+# frame is only serialized once the user asks for a download
+@st.fragment
+def export_section():
+    export_format = st.selectbox("Export Format", list(EXPORT_FORMATS))
+    file_ext, mime_type = EXPORT_FORMATS[export_format]
     
-    st.download_button(
-        label=f"Download {export_format}",
-        data=output,
-        file_name=f"cleaned_data.{export_format.lower()}",
-        mime="application/octet-stream"
-    )
+    if st.button("Prepare download"):
+        st.download_button(
+            label=f"Download {export_format}",
+            data=export_bytes(st.session_state.df, export_format),
+            file_name=f"cleaned_data.{file_ext}",
+            mime=mime_type
+        )
+
+if st.session_state.df is not None:
+    export_section()
 
 # Show logs
 st.sidebar.header("Processing Logs")